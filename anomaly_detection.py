@@ -1,15 +1,79 @@
 import numpy as np
 
+try:
+    import numexpr as ne
+except ImportError:
+    ne = None
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+def _compare(arr, op, value):
+    """Elementwise arr <op> value, fused by numexpr when it is installed"""
+    # Same dtype on both paths so results don't depend on numexpr being present
+    value = arr.dtype.type(value)
+    if ne is not None:
+        return ne.evaluate(f'arr {op} value', local_dict={'arr': arr, 'value': value})
+    return arr < value if op == '<' else arr > value
+
+if njit is not None:
+    # No 'nnan'/'ninf' fast-math flags, NaN samples must never count as spikes
+    @njit(cache=True, fastmath={'reassoc', 'contract'})
+    def _vibration_kernel(arr, z_threshold):
+        """Fused spike detection: (count, max spike) in two streaming loops"""
+        n = arr.size
+        s = 0.0
+        ss = 0.0
+        for x in arr:
+            # Square in float64, float32 x * x loses the spread of large values
+            xd = np.float64(x)
+            s += xd
+            ss += xd * xd
+        mean = s / n
+        var = ss / n - mean * mean
+        if var <= 0.0:
+            return 0, 0.0
+        
+        # float32 cutoff, matching the NumPy path's comparison
+        cutoff = np.float32(mean + z_threshold * np.sqrt(var))
+        count = 0
+        peak = cutoff
+        for x in arr:
+            if x > cutoff:
+                count += 1
+                if x > peak:
+                    peak = x
+        return count, peak
+else:
+    _vibration_kernel = None
+
 def detect_voltage_sag(voltage_data, threshold=7.2):
     """
     Detect voltage drops below safe threshold
     Returns: count of sag events and minimum voltage
     """
-    if not voltage_data:
+    arr = np.asarray(voltage_data, dtype=np.float32)
+    if arr.size == 0:
+        return 0, None
+    
+    # Compare in the array's dtype so the early exit and the count agree
+    threshold = arr.dtype.type(threshold)
+    
+    # The lowest sag voltage is the overall minimum whenever a sag exists
+    min_voltage = arr.min()
+    if min_voltage >= threshold:
         return 0, None
     
-    sag_events = [v for v in voltage_data if v < threshold]
-    return len(sag_events), min(sag_events) if sag_events else None
+    mask = _compare(arr, '<', threshold)
+    count = int(np.count_nonzero(mask))
+    if not count:
+        return 0, None
+    # A NaN sample makes arr.min() NaN, fall back to the sagged values
+    if np.isnan(min_voltage):
+        min_voltage = arr[mask].min()
+    return count, float(min_voltage)
 
 def detect_vibration_spikes(vibration_data, z_threshold=3):
     """
@@ -18,37 +82,60 @@ def detect_vibration_spikes(vibration_data, z_threshold=3):
     if z > 3 → spike
     Returns: count of spikes and maximum spike value
     """
-    if not vibration_data or len(vibration_data) < 2:
+    arr = np.asarray(vibration_data, dtype=np.float32)
+    if arr.size < 2:
         return 0, None
     
-    mean = np.mean(vibration_data)
-    std = np.std(vibration_data)
+    if _vibration_kernel is not None:
+        count, peak = _vibration_kernel(arr, float(z_threshold))
+        return count, float(peak) if count else None
+    
+    # Mean and std from sum / sum-of-squares, accumulated in float64 to
+    # limit cancellation in ss/n - mean^2
+    n = arr.size
+    mean = arr.sum(dtype=np.float64) / n
+    ss = np.einsum('i,i->', arr, arr, dtype=np.float64)
+    std = np.sqrt(max(ss / n - mean * mean, 0.0))
     
     if std == 0:
         return 0, None
     
-    spikes = [vib for vib in vibration_data if (vib - mean) / std > z_threshold]
-    return len(spikes), max(spikes) if spikes else None
+    # z > threshold  <=>  vib > mean + threshold * std (no per-element division)
+    # Cut off in the array's dtype so the early exit and the count agree
+    cutoff = arr.dtype.type(mean + z_threshold * std)
+    
+    # The largest spike is the overall maximum whenever a spike exists.
+    # Written as 'not >' so a NaN max or cutoff also takes the early exit.
+    max_vibration = arr.max()
+    if not max_vibration > cutoff:
+        return 0, None
+    
+    count = int(np.count_nonzero(_compare(arr, '>', cutoff)))
+    return (count, float(max_vibration)) if count else (0, None)
 
 def detect_motor_imbalance(motor_outputs, imbalance_threshold=15):
     """
     Detect if one motor output is consistently higher/lower than others
     Returns: imbalance status and details
     """
+    motors = [np.asarray(motor, dtype=np.float32) for motor in motor_outputs]
+    # Check sizes explicitly, ndarray channels have no unambiguous truth value
+    if not any(motor.size for motor in motors):
+        return False, "No motor data available"
+    
     # Calculate average output for each motor
-    motor_avgs = [(i+1, np.mean(motor)) for i, motor in enumerate(motor_outputs) if motor]
+    motor_nums = [i+1 for i, motor in enumerate(motors) if motor.size]
+    avgs = np.array([motor.mean() for motor in motors if motor.size])
     
-    if len(motor_avgs) < 2:
+    if avgs.size < 2:
         return False, "Insufficient motor data"
     
-    overall_avg = np.mean([avg for _, avg in motor_avgs])
+    overall_avg = avgs.mean()
     
     # Check for imbalance
-    imbalances = []
-    for motor_num, motor_avg in motor_avgs:
-        deviation_pct = ((motor_avg - overall_avg) / overall_avg) * 100
-        if abs(deviation_pct) > imbalance_threshold:
-            imbalances.append(f"Motor {motor_num} is {deviation_pct:+.1f}% from average")
+    deviations = (avgs - overall_avg) / overall_avg * 100
+    imbalances = [f"Motor {motor_nums[i]} is {deviations[i]:+.1f}% from average"
+                  for i in np.flatnonzero(np.abs(deviations) > imbalance_threshold)]
     
     return (True, "; ".join(imbalances)) if imbalances else (False, "All motors balanced")
 
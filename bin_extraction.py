@@ -1,5 +1,23 @@
 from pymavlink import mavutil
 import numpy as np
+import hashlib
+import os
+import tempfile
+import zipfile
+from pathlib import Path
+
+CACHE_DIR = Path('.cache')
+# Bump whenever read_bin_file's output changes so older entries are never loaded
+CACHE_VERSION = 1
+# Least recently used entries beyond this are deleted after each save
+CACHE_MAX_ENTRIES = 32
+
+# pymavlink only opens logs by filename, so stage uploads on tmpfs when available.
+# tmpfs can be small (Docker defaults to 64 MiB), see _stage_bytes for the fallback.
+_STAGING_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+# Per-motor streams are stored in the cache as '<key>_<channel>' arrays
+_CHANNEL_KEYS = ('motor_outputs', 'motor_ts')
 
 def read_bin_file(filepath):
     """Parse ArduPilot .BIN file using pymavlink"""
@@ -9,43 +27,165 @@ def read_bin_file(filepath):
         'battery_voltage': [],
         'battery_current': [],
         'vibration': [],
+        'vibration_ts': [],
         'gps_hdop': [],
         'motor_outputs': [[], [], [], []],
+        'motor_ts': [[], [], [], []],
         'altitude': [],
         'timestamps': []
     }
     
+    vibe_x, vibe_y, vibe_z = [], [], []
+    
+    # Bind append methods once so handlers skip the dict/attribute lookups
+    volt_append = data['battery_voltage'].append
+    curr_append = data['battery_current'].append
+    time_append = data['timestamps'].append
+    vibe_x_append, vibe_y_append, vibe_z_append = vibe_x.append, vibe_y.append, vibe_z.append
+    vibe_ts_append = data['vibration_ts'].append
+    hdop_append = data['gps_hdop'].append
+    motor_appends = [(motor.append, ts.append) for motor, ts in zip(data['motor_outputs'], data['motor_ts'])]
+    alt_append = data['altitude'].append
+    
+    # Battery data
+    def handle_bat(msg):
+        volt_append(msg.Volt)
+        curr_append(msg.Curr)
+        time_append(msg.TimeUS / 1e6)
+    
+    # Vibration data
+    def handle_vibe(msg):
+        vibe_x_append(msg.VibeX)
+        vibe_y_append(msg.VibeY)
+        vibe_z_append(msg.VibeZ)
+        vibe_ts_append(msg.TimeUS / 1e6)
+    
+    # GPS data
+    def handle_gps(msg):
+        hdop_append(msg.HDop / 100.0)
+    
+    # Motor outputs
+    def handle_rcou(msg):
+        t = msg.TimeUS / 1e6
+        for i, (motor_append, ts_append) in enumerate(motor_appends):
+            channel = getattr(msg, f'C{i+1}', None)
+            if channel:
+                motor_append(channel)
+                ts_append(t)
+    
+    # Altitude
+    def handle_baro(msg):
+        alt_append(msg.Alt)
+    
+    handlers = {
+        'BAT': handle_bat,
+        'VIBE': handle_vibe,
+        'GPS': handle_gps,
+        'RCOU': handle_rcou,
+        'BARO': handle_baro,
+    }
+    # Only request the message types we handle so pymavlink can skip the rest
+    wanted_types = list(handlers)
+    
     while True:
-        msg = mlog.recv_match(blocking=False)
+        msg = mlog.recv_match(type=wanted_types, blocking=False)
         if msg is None:
             break
         
-        msg_type = msg.get_type()
-        
-        # Battery data
-        if msg_type == 'BAT':
-            data['battery_voltage'].append(msg.Volt)
-            data['battery_current'].append(msg.Curr)
-            data['timestamps'].append(msg.TimeUS / 1e6)
-        
-        # Vibration data
-        elif msg_type == 'VIBE':
-            vib_magnitude = np.sqrt(msg.VibeX**2 + msg.VibeY**2 + msg.VibeZ**2)
-            data['vibration'].append(vib_magnitude)
-        
-        # GPS data
-        elif msg_type == 'GPS':
-            data['gps_hdop'].append(msg.HDop / 100.0)
-        
-        # Motor outputs
-        elif msg_type == 'RCOU':
-            for i in range(4):
-                channel = getattr(msg, f'C{i+1}', None)
-                if channel:
-                    data['motor_outputs'][i].append(channel)
-        
-        # Altitude
-        elif msg_type == 'BARO':
-            data['altitude'].append(msg.Alt)
+        handlers[msg.get_type()](msg)
+    
+    # Hand typed arrays to the analysis code instead of lists of boxed floats.
+    # Sensor values fit in float32; timestamps stay float64 for microsecond resolution.
+    for key in ('battery_voltage', 'battery_current', 'gps_hdop', 'altitude'):
+        data[key] = np.asarray(data[key], dtype=np.float32)
+    for key in ('timestamps', 'vibration_ts'):
+        data[key] = np.asarray(data[key], dtype=np.float64)
+    data['motor_ts'] = [np.asarray(ts, dtype=np.float64) for ts in data['motor_ts']]
+    
+    # Vibration magnitude sqrt(x² + y² + z²), computed once over all samples
+    vib = np.square(np.asarray(vibe_x, dtype=np.float32))
+    vib += np.square(np.asarray(vibe_y, dtype=np.float32))
+    vib += np.square(np.asarray(vibe_z, dtype=np.float32))
+    data['vibration'] = np.sqrt(vib, out=vib)
+    
+    # One contiguous array per motor channel
+    data['motor_outputs'] = [np.asarray(motor, dtype=np.float32) for motor in data['motor_outputs']]
+    
+    return data
+
+
+def _save_cache(cache_path, data):
+    """Write parsed data to an .npz file, replacing any previous entry atomically"""
+    arrays = {}
+    for key, value in data.items():
+        if key in _CHANNEL_KEYS:
+            arrays.update({f'{key}_{i}': channel for i, channel in enumerate(value)})
+        else:
+            arrays[key] = value
+    
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    # Unique temp name so concurrent sessions saving the same log never share a file
+    with tempfile.NamedTemporaryFile(dir=cache_path.parent, suffix='.tmp', delete=False) as f:
+        tmp_path = f.name
+    try:
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def _load_cache(cache_path):
+    """Rebuild the read_bin_file dictionary from an .npz cache entry"""
+    with np.load(cache_path) as npz:
+        data = {key: npz[key] for key in npz.files if not key.startswith(_CHANNEL_KEYS)}
+        for key in _CHANNEL_KEYS:
+            data[key] = [npz[f'{key}_{i}'] for i in range(4)]
+    return data
+
+def _prune_cache(cache_dir, max_entries):
+    """Delete the least recently used cache entries beyond max_entries"""
+    entries = sorted(Path(cache_dir).glob('*.npz'), key=lambda p: p.stat().st_mtime, reverse=True)
+    for stale in entries[max_entries:]:
+        stale.unlink(missing_ok=True)
+
+def _stage_bytes(file_bytes):
+    """Write bytes to a named temp file, falling back to the default temp dir if tmpfs is full"""
+    for staging_dir in (_STAGING_DIR, None):
+        f = None
+        try:
+            f = tempfile.NamedTemporaryFile(suffix='.bin', dir=staging_dir)
+            f.write(file_bytes)
+            f.flush()
+            return f
+        except OSError:
+            if f is not None:
+                f.close()
+            if staging_dir is None:
+                raise
+
+def read_bin_bytes(file_bytes, cache_dir=CACHE_DIR, max_entries=CACHE_MAX_ENTRIES):
+    """Parse .BIN file contents, reusing an .npz cache keyed by their SHA-256"""
+    digest = hashlib.sha256(file_bytes).hexdigest()
+    cache_path = Path(cache_dir) / f'{digest}.v{CACHE_VERSION}.npz'
+    if cache_path.exists():
+        try:
+            data = _load_cache(cache_path)
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            pass  # Unreadable or stale entry, parse again and overwrite it
+        else:
+            try:
+                os.utime(cache_path)  # Mark as recently used for pruning
+            except OSError:
+                pass
+            return data
+    
+    with _stage_bytes(file_bytes) as f:
+        data = read_bin_file(f.name)
     
+    try:
+        _save_cache(cache_path, data)
+        _prune_cache(cache_dir, max_entries)
+    except OSError:
+        pass  # Caching is best effort
     return data
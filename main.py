@@ -3,41 +3,66 @@ import json
 import numpy as np
 from openai import OpenAI
 import plotly.graph_objects as go
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime
-from bin_extraction import read_bin_file
+from bin_extraction import read_bin_bytes, CACHE_MAX_ENTRIES
 from anomaly_detection import analyze_flight
 
 client = OpenAI(api_key="YOUR_API_KEY")
 
-def get_openai_insights(data, anomaly_results):
+def compute_stats(data):
+    """Compute summary statistics once so every consumer reuses them"""
+    def reduce(key, func):
+        return float(func(data[key])) if len(data[key]) else None
+    
+    ts = data['timestamps']
+    return {
+        'duration': float(ts[-1] - ts[0]) if len(ts) else None,
+        'batt_min': reduce('battery_voltage', np.min),
+        'batt_max': reduce('battery_voltage', np.max),
+        'batt_mean': reduce('battery_voltage', np.mean),
+        'curr_mean': reduce('battery_current', np.mean),
+        'vib_max': reduce('vibration', np.max),
+        'vib_mean': reduce('vibration', np.mean),
+        'gps_mean': reduce('gps_hdop', np.mean),
+        'gps_max': reduce('gps_hdop', np.max),
+        'alt_max': reduce('altitude', np.max),
+        'motors_analyzed': sum(1 for motor in data['motor_outputs'] if len(motor)),
+    }
+
+def _round(value, digits=2):
+    """Round a stat, passing through None for missing streams"""
+    return round(value, digits) if value is not None else None
+
+def get_openai_insights(stats, anomaly_results):
     """Get AI insights from OpenAI GPT-5"""
     summary = {
-        "flight_duration_sec": int(data['timestamps'][-1] - data['timestamps'][0]) if data['timestamps'] else 0,
+        "flight_duration_sec": int(stats['duration']) if stats['duration'] is not None else 0,
         "battery_stats": {
-            "min_voltage": round(min(data['battery_voltage']), 2) if data['battery_voltage'] else None,
-            "max_voltage": round(max(data['battery_voltage']), 2) if data['battery_voltage'] else None,
-            "avg_voltage": round(np.mean(data['battery_voltage']), 2) if data['battery_voltage'] else None,
-            "avg_current": round(np.mean(data['battery_current']), 2) if data['battery_current'] else None,
+            "min_voltage": _round(stats['batt_min']),
+            "max_voltage": _round(stats['batt_max']),
+            "avg_voltage": _round(stats['batt_mean']),
+            "avg_current": _round(stats['curr_mean']),
         },
         "vibration_stats": {
-            "max_vibration": round(max(data['vibration']), 2) if data['vibration'] else None,
-            "avg_vibration": round(np.mean(data['vibration']), 2) if data['vibration'] else None,
+            "max_vibration": _round(stats['vib_max']),
+            "avg_vibration": _round(stats['vib_mean']),
         },
         "gps_stats": {
-            "avg_hdop": round(np.mean(data['gps_hdop']), 2) if data['gps_hdop'] else None,
-            "max_hdop": round(max(data['gps_hdop']), 2) if data['gps_hdop'] else None,
+            "avg_hdop": _round(stats['gps_mean']),
+            "max_hdop": _round(stats['gps_max']),
         },
         "motor_stats": {
-            "motors_analyzed": len([m for m in data['motor_outputs'] if m]),
+            "motors_analyzed": stats['motors_analyzed'],
         },
         "altitude_stats": {
-            "max_altitude": round(max(data['altitude']), 2) if data['altitude'] else None,
+            "max_altitude": _round(stats['alt_max']),
         },
         "anomalies": {
             "voltage_sag_events": anomaly_results['voltage_sag']['count'],
-            "min_voltage_during_sag": anomaly_results['voltage_sag']['min_voltage'],
+            "min_voltage_during_sag": _round(anomaly_results['voltage_sag']['min_voltage']),
             "vibration_spikes": anomaly_results['vibration_spikes']['count'],
-            "max_vibration_spike": anomaly_results['vibration_spikes']['max_vibration'],
+            "max_vibration_spike": _round(anomaly_results['vibration_spikes']['max_vibration']),
             "motor_imbalance": anomaly_results['motor_imbalance']['message'],
         }
     }
@@ -90,23 +115,44 @@ Provide definitive answers based on the available data. Do not ask for additiona
     
     return response.choices[0].message.content
 
+def _decimate(x, y, target=2000):
+    """Reduce a trace to a min/max envelope of about `target` points so spikes and sags stay visible"""
+    if len(y) <= target:
+        return x, y
+    x, y = np.asarray(x), np.asarray(y)
+    n_bins = target // 2
+    bin_size = len(y) // n_bins
+    n_binned = n_bins * bin_size
+    bins = y[:n_binned].reshape(n_bins, bin_size)
+    offsets = np.arange(n_bins) * bin_size
+    # Keep each bin's min and max, the leftover tail's min and max, and the last sample
+    idx = [(np.stack([bins.argmin(axis=1), bins.argmax(axis=1)], axis=1) + offsets[:, None]).ravel()]
+    tail = y[n_binned:]
+    if tail.size:
+        idx.append(np.array([tail.argmin(), tail.argmax()]) + n_binned)
+    idx.append([len(y) - 1])
+    # np.unique sorts the indices back into time order and drops duplicates
+    idx = np.unique(np.concatenate(idx))
+    return x[idx], y[idx]
+
 def create_graph(x, y, title, ylabel, color):
     """Create a simple plotly graph"""
+    x, y = _decimate(x, y)
     fig = go.Figure()
     fig.add_trace(go.Scatter(x=x, y=y, mode='lines', line=dict(color=color, width=2)))
     fig.update_layout(title=title, xaxis_title='Time (s)', yaxis_title=ylabel, template='plotly_dark')
     return fig
 
-def generate_report(data, anomaly_results, insights, filename):
+def generate_report(stats, anomaly_results, insights, filename):
     """Generate text report"""
     lines = [
         "DRONE LOG ANALYSIS REPORT",
         f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
         f"File: {filename}\n",
         "STATISTICS:",
-        f"Duration: {data['timestamps'][-1] - data['timestamps'][0]:.1f}s" if data['timestamps'] else "",
-        f"Voltage: {np.mean(data['battery_voltage']):.2f}V (avg)" if data['battery_voltage'] else "",
-        f"Vibration: {np.mean(data['vibration']):.2f} m/s² (avg)" if data['vibration'] else "",
+        f"Duration: {stats['duration']:.1f}s" if stats['duration'] is not None else "",
+        f"Voltage: {stats['batt_mean']:.2f}V (avg)" if stats['batt_mean'] is not None else "",
+        f"Vibration: {stats['vib_mean']:.2f} m/s² (avg)" if stats['vib_mean'] is not None else "",
         "\nANOMALIES:",
         f"Voltage Sags: {anomaly_results['voltage_sag']['count']}" if anomaly_results['voltage_sag']['detected'] else "None",
         f"Vibration Spikes: {anomaly_results['vibration_spikes']['count']}" if anomaly_results['vibration_spikes']['detected'] else "",
@@ -116,27 +162,34 @@ def generate_report(data, anomaly_results, insights, filename):
     ]
     return "\n".join([l for l in lines if l])
 
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES)
+def process_upload(file_bytes):
+    """Parse and analyze an uploaded .BIN file, cached on its contents across reruns"""
+    data = read_bin_bytes(file_bytes)
+    return data, analyze_flight(data), compute_stats(data)
+
 st.set_page_config(page_title="Drone Analyzer", layout="wide")
 st.title("Drone Log Analyzer")
 
 uploaded_file = st.file_uploader("Upload .BIN file", type=['bin', 'BIN'])
 
 if uploaded_file and st.button("Analyze", type="primary"):
-    with open("temp.bin", "wb") as f:
-        f.write(uploaded_file.getbuffer())
-    
     with st.spinner("Processing..."):
-        data = read_bin_file("temp.bin")
-        anomaly_results = analyze_flight(data)
+        data, anomaly_results, stats = process_upload(uploaded_file.getvalue())
+        
+        # Start the OpenAI request now so its latency overlaps with rendering
+        executor = ThreadPoolExecutor(max_workers=1)
+        insights_future = executor.submit(get_openai_insights, stats, anomaly_results)
+        executor.shutdown(wait=False)
         
         # Stats
         col1, col2, col3 = st.columns(3)
-        if data['timestamps']:
-            col1.metric("Duration", f"{data['timestamps'][-1] - data['timestamps'][0]:.1f}s")
-        if data['battery_voltage']:
-            col2.metric("Avg Voltage", f"{np.mean(data['battery_voltage']):.2f}V")
-        if data['vibration']:
-            col3.metric("Avg Vibration", f"{np.mean(data['vibration']):.2f} m/s²")
+        if stats['duration'] is not None:
+            col1.metric("Duration", f"{stats['duration']:.1f}s")
+        if stats['batt_mean'] is not None:
+            col2.metric("Avg Voltage", f"{stats['batt_mean']:.2f}V")
+        if stats['vib_mean'] is not None:
+            col3.metric("Avg Vibration", f"{stats['vib_mean']:.2f} m/s²")
         
         # Anomalies
         st.subheader("Anomalies Detected")
@@ -151,20 +204,19 @@ if uploaded_file and st.button("Analyze", type="primary"):
         
         # Graphs
         st.subheader("Flight Data Visualization")
-        if data['battery_voltage'] and data['timestamps']:
+        if len(data['battery_voltage']) and len(data['timestamps']):
             st.plotly_chart(create_graph(data['timestamps'], data['battery_voltage'], 'Battery Voltage', 'Voltage (V)', '#00cc96'), width='stretch')
         
-        if data['vibration']:
-            times = np.linspace(data['timestamps'][0], data['timestamps'][-1], len(data['vibration'])) if data['timestamps'] else list(range(len(data['vibration'])))
-            st.plotly_chart(create_graph(times, data['vibration'], 'Vibration', 'Vibration (m/s²)', '#ff6692'), width='stretch')
+        if len(data['vibration']):
+            st.plotly_chart(create_graph(data['vibration_ts'], data['vibration'], 'Vibration', 'Vibration (m/s²)', '#ff6692'), width='stretch')
         
         # Motor outputs
-        if any(data['motor_outputs']):
+        if any(len(motor) for motor in data['motor_outputs']):
             fig = go.Figure()
             colors = ['#636efa', '#ef553b', '#00cc96', '#ab63fa']
-            for i, motor in enumerate(data['motor_outputs']):
-                if motor:
-                    times = np.linspace(data['timestamps'][0], data['timestamps'][-1], len(motor)) if data['timestamps'] else list(range(len(motor)))
+            for i, (motor, times) in enumerate(zip(data['motor_outputs'], data['motor_ts'])):
+                if len(motor):
+                    times, motor = _decimate(times, motor)
                     fig.add_trace(go.Scatter(x=times, y=motor, mode='lines', name=f'Motor {i+1}', line=dict(color=colors[i])))
             fig.update_layout(title='Motor Outputs', xaxis_title='Time (s)', yaxis_title='PWM', template='plotly_dark')
             st.plotly_chart(fig, width='stretch')
@@ -172,12 +224,15 @@ if uploaded_file and st.button("Analyze", type="primary"):
         # AI Insights
         st.subheader("GPT5 Insights")
         try:
-            insights = get_openai_insights(data, anomaly_results)
+            insights = insights_future.result(timeout=60)
             st.markdown(insights)
+        except FutureTimeoutError:
+            st.error("Error getting AI insights: OpenAI did not respond within 60 seconds")
+            insights = "AI analysis unavailable"
         except Exception as e:
             st.error(f"Error getting AI insights: {str(e)}")
             insights = "AI analysis unavailable"
         
         # Download
-        report = generate_report(data, anomaly_results, insights, uploaded_file.name)
+        report = generate_report(stats, anomaly_results, insights, uploaded_file.name)
         st.download_button("Download Report", report, f"report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt", type="primary")